@@ -8,39 +8,93 @@ Endpoints:
     POST /webhook/whatsapp - Process incoming WhatsApp orders
 """
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import itertools
 import logging
+import multiprocessing
+import os
+import time
 from datetime import datetime
 
-# Import core modules (to be created)
-try:
-    from src.database import InventoryDB
-    from src.order_parser import OrderParser
-    from src.invoice_generator import GSTInvoiceGenerator
-except ImportError:
-    # Graceful fallback for development
-    InventoryDB = None
-    OrderParser = None
-    GSTInvoiceGenerator = None
+import orjson
+
+from src.database import InventoryDB
+from src.order_parser import OrderParser
+from src.invoice_generator import GSTInvoiceGenerator, init_invoice_worker, create_invoice_in_worker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# PDF rendering processes per server process (uvicorn --workers multiplies this)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create core components and worker pools on startup, shut down on exit"""
+    # Core components
+    app.state.db = InventoryDB()
+    app.state.order_parser = OrderParser()
+    app.state.invoice_gen = GSTInvoiceGenerator()
+    
+    # Pay cold-start costs here instead of on the first request
+    app.state.db.warmup()
+    
+    # PDF rendering is CPU-bound, run it in separate processes; each worker
+    # builds and warms up its own generator once when it starts. Workers are
+    # not forked from this process, which already has threads and an open
+    # SQLite connection.
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    invoice_gen = app.state.invoice_gen
+    app.state.pdf_pool = ProcessPoolExecutor(
+        max_workers=PDF_WORKERS,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=init_invoice_worker,
+        initargs=(invoice_gen.store_name, invoice_gen.store_gstin, invoice_gen.upi_id)
+    )
+    
+    # The pool starts processes lazily; start and warm every worker now so the
+    # first order doesn't pay for it
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(app.state.pdf_pool, os.getpid) for _ in range(PDF_WORKERS)
+    ))
+    
+    # Per-process sequence counter, keeps order IDs unique within one nanosecond tick
+    app.state.order_seq = itertools.count()
+    yield
+    app.state.pdf_pool.shutdown()
+    app.state.db.close()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Kirana Store Automation API",
     description="WhatsApp order automation with OCR inventory & GST invoicing",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
+# Pre-serialized root response
+_ROOT_BODY = orjson.dumps({
+    "service": "Kirana Store Automation",
+    "version": "0.1.0",
+    "status": "active",
+    "endpoints": ["/health", "/webhook/whatsapp"]
+})
 
-# Initialize core components
-db = InventoryDB() if InventoryDB else None
-order_parser = OrderParser() if OrderParser else None
-invoice_gen = GSTInvoiceGenerator() if GSTInvoiceGenerator else None
+# Health check body, rebuilt at most once per second: (unix second, body)
+_health_cache = (0, b"")
 
 
 class WhatsAppMessage(BaseModel):
@@ -63,30 +117,33 @@ class OrderResponse(BaseModel):
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {
-        "service": "Kirana Store Automation",
-        "version": "0.1.0",
-        "status": "active",
-        "endpoints": ["/health", "/webhook/whatsapp"]
-    }
+    return Response(_ROOT_BODY, media_type="application/json")
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint for monitoring"""
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "components": {
-            "database": db is not None,
-            "order_parser": order_parser is not None,
-            "invoice_generator": invoice_gen is not None
-        }
-    }
+    global _health_cache
+    
+    now = int(time.time())
+    if now != _health_cache[0]:
+        state = request.app.state
+        body = orjson.dumps({
+            "status": "healthy",
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "components": {
+                "database": hasattr(state, "db"),
+                "order_parser": hasattr(state, "order_parser"),
+                "invoice_generator": hasattr(state, "invoice_gen")
+            }
+        })
+        _health_cache = (now, body)
+    
+    return Response(_health_cache[1], media_type="application/json")
 
 
 @app.post("/webhook/whatsapp", response_model=OrderResponse)
-async def process_whatsapp_order(message: WhatsAppMessage):
+async def process_whatsapp_order(message: WhatsAppMessage, request: Request):
     """
     Process incoming WhatsApp order message
     
@@ -96,19 +153,14 @@ async def process_whatsapp_order(message: WhatsAppMessage):
     Returns:
         OrderResponse with reply text and order details
     """
+    state = request.app.state
+    reserved_items = None
+    
     try:
-        logger.info(f"Processing order from {message.customer_name}: {message.message}")
-        
-        # Validate components are loaded
-        if not all([db, order_parser, invoice_gen]):
-            return OrderResponse(
-                success=False,
-                reply_text="System initialization in progress. Please try again.",
-                error="Core components not initialized"
-            )
+        logger.info("Processing order from %s: %s", message.customer_name, message.message)
         
         # Parse Hinglish order
-        parsed_order = order_parser.parse_hinglish_order(message.message)
+        parsed_order = state.order_parser.parse_hinglish_order(message.message)
         
         if not parsed_order or not parsed_order.get("items"):
             return OrderResponse(
@@ -117,16 +169,13 @@ async def process_whatsapp_order(message: WhatsAppMessage):
                 error="Failed to parse order"
             )
         
-        # Check inventory availability
-        unavailable_items = []
-        available_items = []
+        # Database and invoice generator work on plain dicts
+        order_data = {**parsed_order, "items": [item.to_dict() for item in parsed_order["items"]]}
         
-        for item in parsed_order["items"]:
-            db_item = db.get_item_by_name(item["name"])
-            if db_item and db_item["stock"] >= item["quantity"]:
-                available_items.append(item)
-            else:
-                unavailable_items.append(item["name"])
+        # Check inventory availability and reserve stock
+        available_items, unavailable_items = await asyncio.to_thread(
+            state.db.reserve_items, order_data["items"]
+        )
         
         # Generate reply
         if unavailable_items:
@@ -142,27 +191,29 @@ async def process_whatsapp_order(message: WhatsAppMessage):
                 error="Some items unavailable"
             )
         
+        # Stock is now deducted; released again if anything below fails
+        reserved_items = order_data["items"]
+        
         # Generate invoice
-        order_id = f"ORD{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = f"ORD{time.time_ns():019d}{next(state.order_seq):04d}"
         invoice_path = f"invoices/{order_id}.pdf"
         
-        invoice_gen.create_invoice(
-            order_data=parsed_order,
-            customer_data={
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            state.pdf_pool,
+            create_invoice_in_worker,
+            order_data,
+            {
                 "name": message.customer_name,
                 "phone": message.customer_phone
             },
-            output_path=invoice_path
+            invoice_path
         )
         
-        # Update inventory
-        for item in available_items:
-            db.update_stock(item["name"], -item["quantity"])
-        
         # Generate confirmation reply
-        reply = order_parser.generate_reply(parsed_order, message.customer_name)
+        reply = state.order_parser.generate_reply(parsed_order, message.customer_name)
         
-        logger.info(f"Order {order_id} processed successfully")
+        logger.info("Order %s processed successfully", order_id)
         
         return OrderResponse(
             success=True,
@@ -172,7 +223,13 @@ async def process_whatsapp_order(message: WhatsAppMessage):
         )
     
     except Exception as e:
-        logger.error(f"Error processing order: {str(e)}")
+        logger.error("Error processing order: %s", e)
+        # Put back stock taken for an order that was not completed
+        if reserved_items:
+            try:
+                await asyncio.to_thread(state.db.release_items, reserved_items)
+            except Exception as release_error:
+                logger.error("Error releasing reserved stock: %s", release_error)
         return OrderResponse(
             success=False,
             reply_text=f"Sorry {message.customer_name}, there was an error processing your order. Please try again.",
@@ -183,8 +240,8 @@ async def process_whatsapp_order(message: WhatsAppMessage):
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
-    logger.error(f"Unhandled exception: {str(exc)}")
-    return JSONResponse(
+    logger.error("Unhandled exception: %s", exc)
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -196,4 +253,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    # Development server with auto-reload. In production run without reload
+    # and several workers; each also starts PDF_WORKERS rendering processes, e.g.:
+    #   PDF_WORKERS=1 uvicorn app:app --host 0.0.0.0 --port 8000 --workers $(nproc)
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
@@ -11,8 +11,11 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom Styling
-st.markdown("""
+
+@st.cache_data
+def _css():
+    """Custom dashboard styling"""
+    return """
     <style>
     .main {
         background-color: #f5f7f9;
@@ -31,7 +34,56 @@ st.markdown("""
         box-shadow: 0 4px 6px rgba(0,0,0,0.1);
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+
+@st.cache_data
+def _recent_orders():
+    """Mock recent WhatsApp orders for the Overview tab"""
+    return pd.DataFrame({
+        'Customer': ['Amit', 'Suresh', 'Priya', 'Rahul'],
+        'Message': ['2kg sugar, 1kg atta', '1 lux soap, 5kg rice', '2 litre milk, 1 bread', '10kg wheat'],
+        'Status': ['Processed', 'Pending', 'Delivered', 'Processed'],
+        'Amount': ['₹145', '₹320', '₹90', '₹450']
+    })
+
+
+@st.cache_data
+def _inventory_mock():
+    """Mock inventory for the Inventory tab"""
+    # In a real app, this would fetch from SQLite via FastAPI
+    return pd.DataFrame({
+        'Item Name': ['Sugar (Madhur)', 'Atta (Aashirvaad)', 'Lux Soap', 'Milk (Amul)', 'Rice (Basmati)'],
+        'Stock': [45, 12, 85, 20, 150],
+        'Unit': ['kg', 'kg', 'pcs', 'litres', 'kg'],
+        'Price': [45, 55, 35, 65, 95],
+        'GST': ['5%', '0%', '18%', '0%', '5%']
+    })
+
+
+@st.cache_data
+def _extracted_mock():
+    """Mock OCR extraction result"""
+    return pd.DataFrame({
+        'Item': ['Sugar', 'Atta', 'Soap'],
+        'Qty': ['2kg', '5kg', '2pcs'],
+        'Confidence': ['98%', '95%', '92%']
+    })
+
+
+@st.cache_data
+def _invoices_mock():
+    """Mock invoice history for the Invoices tab"""
+    return pd.DataFrame({
+        'Invoice ID': ['INV-2026-001', 'INV-2026-002', 'INV-2026-003'],
+        'Customer': ['Amit', 'Rahul', 'Suresh'],
+        'Date': ['2026-02-15', '2026-02-15', '2026-02-14'],
+        'Total': ['₹245', '₹450', '₹320']
+    })
+
+
+# Custom Styling
+st.markdown(_css(), unsafe_allow_html=True)
 
 # Sidebar
 st.sidebar.title("🛒 Kirana Automation")
@@ -60,26 +112,11 @@ if menu == "Overview":
     
     st.subheader("Recent WhatsApp Orders")
     # Mock data for demonstration
-    recent_orders = pd.DataFrame({
-        'Customer': ['Amit', 'Suresh', 'Priya', 'Rahul'],
-        'Message': ['2kg sugar, 1kg atta', '1 lux soap, 5kg rice', '2 litre milk, 1 bread', '10kg wheat'],
-        'Status': ['Processed', 'Pending', 'Delivered', 'Processed'],
-        'Amount': ['₹145', '₹320', '₹90', '₹450']
-    })
-    st.table(recent_orders)
+    st.table(_recent_orders())
 
 elif menu == "Inventory":
     st.subheader("Inventory Management")
-    # In a real app, this would fetch from SQLite via FastAPI
-    inventory_data = pd.DataFrame({
-        'Item Name': ['Sugar (Madhur)', 'Atta (Aashirvaad)', 'Lux Soap', 'Milk (Amul)', 'Rice (Basmati)'],
-        'Stock': [45, 12, 85, 20, 150],
-        'Unit': ['kg', 'kg', 'pcs', 'litres', 'kg'],
-        'Price': [45, 55, 35, 65, 95],
-        'GST': ['5%', '0%', '18%', '0%', '5%']
-    })
-    
-    st.dataframe(inventory_data, use_container_width=True)
+    st.dataframe(_inventory_mock(), use_container_width=True)
     
     with st.expander("Add New Item"):
         c1, c2, c3 = st.columns(3)
@@ -101,12 +138,7 @@ elif menu == "OCR Digitization":
                 # Mock result
                 st.success("Digitization Complete!")
                 st.write("### Extracted Items:")
-                extracted = pd.DataFrame({
-                    'Item': ['Sugar', 'Atta', 'Soap'],
-                    'Qty': ['2kg', '5kg', '2pcs'],
-                    'Confidence': ['98%', '95%', '92%']
-                })
-                st.table(extracted)
+                st.table(_extracted_mock())
                 st.button("Sync to Inventory")
 
 elif menu == "WhatsApp Orders":
@@ -129,13 +161,7 @@ elif menu == "Invoices":
     st.subheader("GST Invoice History")
     st.write("Download and send professional invoices with UPI QR codes.")
     
-    invoices = pd.DataFrame({
-        'Invoice ID': ['INV-2026-001', 'INV-2026-002', 'INV-2026-003'],
-        'Customer': ['Amit', 'Rahul', 'Suresh'],
-        'Date': ['2026-02-15', '2026-02-15', '2026-02-14'],
-        'Total': ['₹245', '₹450', '₹320']
-    })
-    st.dataframe(invoices, use_container_width=True)
+    st.dataframe(_invoices_mock(), use_container_width=True)
     st.button("Generate New Manual Invoice")
 
 # Footer
@@ -6,21 +6,22 @@ Core modules for Kirana store automation system.
 __version__ = "0.1.0"
 
 from .database import InventoryDB
-from .order_parser import OrderParser
+from .order_parser import OrderParser, OrderItem
+from .invoice_generator import GSTInvoiceGenerator
 
-try:
-    from .invoice_generator import GSTInvoiceGenerator
-except ImportError:
-    GSTInvoiceGenerator = None
 
-try:
-    from .ocr_engine import LedgerOCR
-except ImportError:
-    LedgerOCR = None
+def __getattr__(name):
+    # OCR needs Tesseract and OpenCV, so it is only imported on first use
+    if name == "LedgerOCR":
+        from .ocr_engine import LedgerOCR
+        return LedgerOCR
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "InventoryDB",
     "OrderParser",
+    "OrderItem",
     "GSTInvoiceGenerator",
     "LedgerOCR",
 ]
@@ -6,6 +6,8 @@ Supports CRUD operations on inventory items with stock tracking.
 
 import sqlite3
 import logging
+import threading
+import time
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import os
@@ -13,9 +15,29 @@ import os
 logger = logging.getLogger(__name__)
 
 
+def _rows_to_dicts(rows: List[sqlite3.Row]) -> List[Dict]:
+    """Convert fetched rows to dicts, reading column names once"""
+    if not rows:
+        return []
+    keys = rows[0].keys()
+    return [dict(zip(keys, row)) for row in rows]
+
+
 class InventoryDB:
     """SQLite-based inventory database manager"""
     
+    # Item columns returned to callers
+    _ITEM_COLUMNS = 'id, name, brand, unit, stock, price, gst_rate, category, created_at, updated_at'
+    
+    # Fixed query strings so SQLite's statement cache is reused across calls
+    _LIST_ALL = f'SELECT {_ITEM_COLUMNS} FROM items ORDER BY name'
+    _LIST_IN_STOCK = f'SELECT {_ITEM_COLUMNS} FROM items WHERE stock > 0 ORDER BY name'
+    _LIST_CATEGORY = f'SELECT {_ITEM_COLUMNS} FROM items WHERE category = ? ORDER BY name'
+    _LIST_CATEGORY_IN_STOCK = f'SELECT {_ITEM_COLUMNS} FROM items WHERE category = ? AND stock > 0 ORDER BY name'
+    _SEARCH = f'SELECT {_ITEM_COLUMNS} FROM items WHERE name_lc LIKE ? OR LOWER(brand) LIKE ? ORDER BY name'
+    _GET_BY_NAME = f'SELECT {_ITEM_COLUMNS} FROM items WHERE name_lc = ?'
+    _GET_BY_ID = f'SELECT {_ITEM_COLUMNS} FROM items WHERE id = ?'
+    
     def __init__(self, db_path: str = "data/inventory.db"):
         """
         Initialize database connection
@@ -28,53 +50,130 @@ class InventoryDB:
         # Create data directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
+        # Single persistent connection shared by all methods (autocommit mode,
+        # transactions are opened explicitly where needed)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+        self._conn.execute("PRAGMA cache_size=-20000")
+        
+        # Serialize writers on the shared connection
+        self._write_lock = threading.Lock()
+        
+        # Short-lived cache of item rows keyed by lowercased name
+        self._item_cache: Dict[str, Tuple[float, Dict]] = {}
+        self._cache_ttl = 30.0
+        self._cache_lock = threading.Lock()
+        
         # Initialize database
         self.init_db()
-        logger.info(f"Inventory database initialized at {db_path}")
+        
+        # Known lowercased item names, checked before querying for an item
+        self._load_names()
+        logger.info("Inventory database initialized at %s", db_path)
     
     def get_connection(self) -> sqlite3.Connection:
-        """Get database connection with row factory"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Get the shared database connection"""
+        return self._conn
+    
+    def _invalidate_cached_item(self, name: str):
+        """Drop an item from the row cache after it changes"""
+        with self._cache_lock:
+            self._item_cache.pop(name.lower(), None)
+    
+    def _load_names(self):
+        """Reload the set of known item names"""
+        self._name_set = {row['name_lc'] for row in self._conn.execute('SELECT name_lc FROM items')}
+        self._names_loaded_at = time.monotonic()
+    
+    def _is_known_name(self, key: str) -> bool:
+        """Check a lowercased name against the known-name set, reloading it when stale"""
+        if key in self._name_set:
+            return True
+        # Items may have been added by another process since the last load
+        if time.monotonic() - self._names_loaded_at >= self._cache_ttl:
+            self._load_names()
+            return key in self._name_set
+        return False
+    
+    def warmup(self):
+        """Fault in database pages, prime the statement cache and item cache"""
+        self._conn.execute('SELECT count(*) FROM items').fetchone()
+        self._conn.execute('SELECT count(*) FROM stock_history').fetchone()
+        
+        # Run the fixed queries once so their compiled statements are cached
+        self._conn.execute(self._GET_BY_NAME, ('',)).fetchone()
+        self._conn.execute(self._GET_BY_ID, (0,)).fetchone()
+        self._conn.execute(self._LIST_IN_STOCK).fetchall()
+        self._conn.execute(self._LIST_CATEGORY, ('',)).fetchall()
+        self._conn.execute(self._LIST_CATEGORY_IN_STOCK, ('',)).fetchall()
+        self._conn.execute(self._SEARCH, ('', '')).fetchall()
+        
+        # Load every item into the name set and row cache
+        items = _rows_to_dicts(self._conn.execute(self._LIST_ALL).fetchall())
+        now = time.monotonic()
+        with self._cache_lock:
+            for item in items:
+                self._item_cache[item['name'].lower()] = (now, item)
+        self._load_names()
+        logger.info("Database warmed up with %d items", len(items))
+    
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
     
     def init_db(self):
         """Initialize database schema"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Create items table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                brand TEXT,
-                unit TEXT NOT NULL,
-                stock REAL NOT NULL DEFAULT 0,
-                price REAL NOT NULL,
-                gst_rate REAL DEFAULT 5.0,
-                category TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        with self._write_lock:
+            # Create items table
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    name_lc TEXT GENERATED ALWAYS AS (lower(name)) VIRTUAL,
+                    brand TEXT,
+                    unit TEXT NOT NULL,
+                    stock REAL NOT NULL DEFAULT 0,
+                    price REAL NOT NULL,
+                    gst_rate REAL DEFAULT 5.0,
+                    category TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create stock_history table for audit
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS stock_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    item_id INTEGER NOT NULL,
+                    change_amount REAL NOT NULL,
+                    previous_stock REAL NOT NULL,
+                    new_stock REAL NOT NULL,
+                    reason TEXT,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (item_id) REFERENCES items (id)
+                )
+            ''')
+            
+            # Add lowercase name column to databases created before it existed
+            columns = [row['name'] for row in self._conn.execute('PRAGMA table_xinfo(items)')]
+            if 'name_lc' not in columns:
+                self._conn.execute(
+                    'ALTER TABLE items ADD COLUMN name_lc TEXT GENERATED ALWAYS AS (lower(name)) VIRTUAL'
+                )
+            
+            # Indexes for case-insensitive lookups and per-item history
+            self._conn.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS idx_items_name_lc ON items (name_lc)'
             )
-        ''')
-        
-        # Create stock_history table for audit
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stock_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_id INTEGER NOT NULL,
-                change_amount REAL NOT NULL,
-                previous_stock REAL NOT NULL,
-                new_stock REAL NOT NULL,
-                reason TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (item_id) REFERENCES items (id)
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_stock_history_item_ts ON stock_history (item_id, timestamp DESC)'
             )
-        ''')
         
-        conn.commit()
-        conn.close()
         logger.info("Database schema initialized")
     
     def add_item(self, name: str, brand: str, unit: str, stock: float, 
@@ -94,26 +193,22 @@ class InventoryDB:
         Returns:
             Item ID
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                INSERT INTO items (name, brand, unit, stock, price, gst_rate, category)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (name.lower(), brand, unit, stock, price, gst_rate, category))
+            with self._write_lock:
+                cursor = self._conn.execute('''
+                    INSERT INTO items (name, brand, unit, stock, price, gst_rate, category)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (name.lower(), brand, unit, stock, price, gst_rate, category))
             
             item_id = cursor.lastrowid
-            conn.commit()
-            logger.info(f"Added item: {name} (ID: {item_id})")
+            self._invalidate_cached_item(name)
+            self._name_set.add(name.lower())
+            logger.info("Added item: %s (ID: %s)", name, item_id)
             return item_id
         
         except sqlite3.IntegrityError:
-            logger.warning(f"Item already exists: {name}")
+            logger.warning("Item already exists: %s", name)
             raise ValueError(f"Item '{name}' already exists")
-        
-        finally:
-            conn.close()
     
     def get_item_by_name(self, name: str) -> Optional[Dict]:
         """
@@ -125,28 +220,27 @@ class InventoryDB:
         Returns:
             Item dict or None
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        key = name.lower()
+        if not self._is_known_name(key):
+            return None
         
-        cursor.execute('''
-            SELECT * FROM items WHERE LOWER(name) = LOWER(?)
-        ''', (name,))
+        with self._cache_lock:
+            cached = self._item_cache.get(key)
+        if cached and time.monotonic() - cached[0] < self._cache_ttl:
+            return dict(cached[1])
         
-        row = cursor.fetchone()
-        conn.close()
+        row = self._conn.execute(self._GET_BY_NAME, (key,)).fetchone()
         
         if row:
-            return dict(row)
+            item = dict(row)
+            with self._cache_lock:
+                self._item_cache[key] = (time.monotonic(), item)
+            return dict(item)
         return None
     
     def get_item_by_id(self, item_id: int) -> Optional[Dict]:
         """Get item by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM items WHERE id = ?', (item_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self._conn.execute(self._GET_BY_ID, (item_id,)).fetchone()
         
         if row:
             return dict(row)
@@ -164,45 +258,160 @@ class InventoryDB:
         Returns:
             True if successful, False otherwise
         """
-        item = self.get_item_by_name(name)
-        if not item:
-            logger.error(f"Item not found: {name}")
-            return False
-        
-        new_stock = item['stock'] + change
+        with self._write_lock:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                
+                # Update item stock, refusing to go below zero
+                row = self._conn.execute('''
+                    UPDATE items 
+                    SET stock = stock + ?, updated_at = CURRENT_TIMESTAMP 
+                    WHERE name_lc = ? AND stock + ? >= 0
+                    RETURNING id, stock - ? AS previous_stock, stock AS new_stock
+                ''', (change, name.lower(), change, change)).fetchone()
+                
+                if row is None:
+                    self._conn.execute('ROLLBACK')
+                    logger.error("Item not found or insufficient stock: %s", name)
+                    return False
+                
+                # Record stock history
+                self._conn.execute('''
+                    INSERT INTO stock_history (item_id, change_amount, previous_stock, new_stock, reason)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (row['id'], change, row['previous_stock'], row['new_stock'], reason))
+                
+                self._conn.execute('COMMIT')
+                self._invalidate_cached_item(name)
+                logger.info("Updated stock for %s: %s -> %s", name, row['previous_stock'], row['new_stock'])
+                return True
+            
+            except Exception as e:
+                logger.error("Error updating stock: %s", e)
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                return False
+    
+    def reserve_items(self, items: List[Dict], reason: str = "order") -> Tuple[List[Dict], List[str]]:
+        """
+        Check availability for a whole order and deduct stock in one transaction
         
-        if new_stock < 0:
-            logger.error(f"Insufficient stock for {name}: {item['stock']} units")
-            return False
+        Stock is only deducted when every item is available; otherwise the
+        inventory is left untouched.
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        Args:
+            items: Order items with 'name' and 'quantity'
+            reason: Reason for stock change
         
-        try:
-            # Update item stock
-            cursor.execute('''
-                UPDATE items 
-                SET stock = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            ''', (new_stock, item['id']))
-            
-            # Record stock history
-            cursor.execute('''
-                INSERT INTO stock_history (item_id, change_amount, previous_stock, new_stock, reason)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (item['id'], change, item['stock'], new_stock, reason))
+        Returns:
+            Tuple of (available items, unavailable item names)
+        """
+        # Total quantity requested per item name
+        requested = {}
+        for item in items:
+            key = item["name"].lower()
+            requested[key] = requested.get(key, 0) + item["quantity"]
+        
+        if not requested:
+            return [], []
+        
+        # Only query names that exist; unknown items are unavailable
+        known = [name for name in requested if self._is_known_name(name)]
+        if not known:
+            return [], [item["name"] for item in items]
+        
+        placeholders = ",".join("?" * len(known))
+        
+        with self._write_lock:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                
+                rows = self._conn.execute(
+                    f'SELECT id, name_lc, stock FROM items WHERE name_lc IN ({placeholders})',
+                    known
+                ).fetchall()
+                stock = {row['name_lc']: row for row in rows}
+                
+                available = []
+                unavailable = []
+                for item in items:
+                    row = stock.get(item["name"].lower())
+                    if row and row['stock'] >= requested[row['name_lc']]:
+                        available.append(item)
+                    else:
+                        unavailable.append(item["name"])
+                
+                if unavailable:
+                    self._conn.execute('ROLLBACK')
+                    return available, unavailable
+                
+                changes = [(stock[name], -qty) for name, qty in requested.items()]
+                self._conn.executemany('''
+                    UPDATE items 
+                    SET stock = stock + ?, updated_at = CURRENT_TIMESTAMP 
+                    WHERE id = ?
+                ''', [(change, row['id']) for row, change in changes])
+                self._conn.executemany('''
+                    INSERT INTO stock_history (item_id, change_amount, previous_stock, new_stock, reason)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(row['id'], change, row['stock'], row['stock'] + change, reason)
+                      for row, change in changes])
+                
+                self._conn.execute('COMMIT')
+                for name in requested:
+                    self._invalidate_cached_item(name)
+                logger.info("Reserved stock for %d items", len(changes))
+                return available, unavailable
             
-            conn.commit()
-            logger.info(f"Updated stock for {name}: {item['stock']} -> {new_stock}")
-            return True
-        
-        except Exception as e:
-            logger.error(f"Error updating stock: {e}")
-            conn.rollback()
-            return False
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                raise
+    
+    def release_items(self, items: List[Dict], reason: str = "order cancelled"):
+        """
+        Return stock taken by reserve_items, e.g. when the order fails afterwards
         
-        finally:
-            conn.close()
+        Args:
+            items: Order items with 'name' and 'quantity', as passed to reserve_items
+            reason: Reason for stock change
+        """
+        # Total quantity to return per item name
+        returned = {}
+        for item in items:
+            key = item["name"].lower()
+            returned[key] = returned.get(key, 0) + item["quantity"]
+        
+        if not returned:
+            return
+        
+        with self._write_lock:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                
+                for name, qty in returned.items():
+                    row = self._conn.execute('''
+                        UPDATE items 
+                        SET stock = stock + ?, updated_at = CURRENT_TIMESTAMP 
+                        WHERE name_lc = ?
+                        RETURNING id, stock - ? AS previous_stock, stock AS new_stock
+                    ''', (qty, name, qty)).fetchone()
+                    if row is None:
+                        continue
+                    self._conn.execute('''
+                        INSERT INTO stock_history (item_id, change_amount, previous_stock, new_stock, reason)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (row['id'], qty, row['previous_stock'], row['new_stock'], reason))
+                
+                self._conn.execute('COMMIT')
+                for name in returned:
+                    self._invalidate_cached_item(name)
+                logger.info("Released stock for %d items", len(returned))
+            
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                raise
     
     def list_items(self, category: str = None, in_stock_only: bool = False) -> List[Dict]:
         """
@@ -215,26 +424,14 @@ class InventoryDB:
         Returns:
             List of item dicts
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = 'SELECT * FROM items WHERE 1=1'
-        params = []
-        
         if category:
-            query += ' AND category = ?'
-            params.append(category)
-        
-        if in_stock_only:
-            query += ' AND stock > 0'
-        
-        query += ' ORDER BY name'
+            query = self._LIST_CATEGORY_IN_STOCK if in_stock_only else self._LIST_CATEGORY
+            rows = self._conn.execute(query, (category,)).fetchall()
+        else:
+            query = self._LIST_IN_STOCK if in_stock_only else self._LIST_ALL
+            rows = self._conn.execute(query).fetchall()
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
+        return _rows_to_dicts(rows)
     
     def search_items(self, query: str) -> List[Dict]:
         """
@@ -246,19 +443,10 @@ class InventoryDB:
         Returns:
             List of matching items
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM items 
-            WHERE LOWER(name) LIKE LOWER(?) OR LOWER(brand) LIKE LOWER(?)
-            ORDER BY name
-        ''', (f'%{query}%', f'%{query}%'))
+        pattern = f'%{query.lower()}%'
+        rows = self._conn.execute(self._SEARCH, (pattern, pattern)).fetchall()
         
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
+        return _rows_to_dicts(rows)
     
     def delete_item(self, name: str) -> bool:
         """
@@ -272,24 +460,20 @@ class InventoryDB:
         """
         item = self.get_item_by_name(name)
         if not item:
-            logger.error(f"Item not found: {name}")
+            logger.error("Item not found: %s", name)
             return False
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('DELETE FROM items WHERE id = ?', (item['id'],))
-            conn.commit()
-            logger.info(f"Deleted item: {name}")
+            with self._write_lock:
+                self._conn.execute('DELETE FROM items WHERE id = ?', (item['id'],))
+            self._invalidate_cached_item(name)
+            self._name_set.discard(name.lower())
+            logger.info("Deleted item: %s", name)
             return True
         
         except Exception as e:
-            logger.error(f"Error deleting item: {e}")
+            logger.error("Error deleting item: %s", e)
             return False
-        
-        finally:
-            conn.close()
     
     def get_stock_history(self, name: str, limit: int = 10) -> List[Dict]:
         """
@@ -306,20 +490,14 @@ class InventoryDB:
         if not item:
             return []
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        rows = self._conn.execute('''
             SELECT * FROM stock_history 
             WHERE item_id = ? 
             ORDER BY timestamp DESC 
             LIMIT ?
-        ''', (item['id'], limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        ''', (item['id'], limit)).fetchall()
         
-        return [dict(row) for row in rows]
+        return _rows_to_dicts(rows)
 
 
 # Example usage
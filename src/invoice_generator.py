@@ -4,22 +4,37 @@ Generates PDF invoices with GST calculations and UPI QR codes.
 """
 
 import logging
+import functools
 from datetime import datetime
 from typing import Dict, List
+from urllib.parse import quote
 import os
 
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import inch
-    import qrcode
-    from io import BytesIO
-except ImportError:
-    logging.warning("ReportLab or qrcode not installed. Invoice generation will not work.")
+from io import BytesIO
+
+import numpy as np
+import qrcode
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=512)
+def _qr_png(upi_string: str) -> bytes:
+    """Encode a UPI payment string as QR code PNG bytes (cached per string)"""
+    qr = qrcode.QRCode(version=1, box_size=10, border=2)
+    qr.add_data(upi_string)
+    qr.make(fit=True)
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    img_buffer = BytesIO()
+    img.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+
 class GSTInvoiceGenerator:
     """Generate GST-compliant invoices with UPI payment QR codes"""
     
@@ -27,6 +42,31 @@ class GSTInvoiceGenerator:
         self.store_name = store_name
         self.store_gstin = store_gstin
         self.upi_id = upi_id
+        
+        # Static page layout, computed once
+        height = A4[1]
+        self._col_x = (1*inch, 3*inch, 4*inch, 5*inch)
+        self._header_y = (height - 1*inch, height - 1.3*inch, height - 1.5*inch)
+        self._customer_y = (height - 2*inch, height - 2.3*inch, height - 2.5*inch)
+        self._table_y = height - 3.5*inch
+        self._row_height = 0.25*inch
+        self._rule_x = (1*inch, 6*inch)
+        self._qr_box = (1*inch, 0.5*inch, 1.5*inch, 1.5*inch)
+        self._qr_label_y = 2*inch
+        self._gstin_text = f"GSTIN: {store_gstin or 'Not Registered'}"
+        
+        # UPI payment URI up to the amount, which is appended per invoice
+        self._upi_prefix = f"upi://pay?pa={upi_id}&pn={quote(store_name)}&cu=INR&am="
+    
+    def warmup(self):
+        """Load fonts and the QR code path once so the first invoice is not slower"""
+        c = canvas.Canvas(BytesIO(), pagesize=A4)
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(self._col_x[0], self._header_y[0], self.store_name)
+        png = _qr_png(self._upi_prefix + f"{0:.2f}")
+        x, qr_y, qr_w, qr_h = self._qr_box
+        c.drawImage(ImageReader(BytesIO(png)), x, qr_y, width=qr_w, height=qr_h)
+        c.save()
     
     def create_invoice(self, order_data: Dict, customer_data: Dict, output_path: str):
         """
@@ -38,82 +78,102 @@ class GSTInvoiceGenerator:
             output_path: Path to save PDF
         """
         # Create output directory if needed
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
         
         # Create PDF
         c = canvas.Canvas(output_path, pagesize=A4)
-        width, height = A4
+        col_x = self._col_x
+        invoice_date = datetime.now().strftime('%d-%m-%Y')
         
         # Header
         c.setFont("Helvetica-Bold", 16)
-        c.drawString(1*inch, height - 1*inch, self.store_name)
+        c.drawString(col_x[0], self._header_y[0], self.store_name)
         
         c.setFont("Helvetica", 10)
-        c.drawString(1*inch, height - 1.3*inch, f"GSTIN: {self.store_gstin or 'Not Registered'}")
-        c.drawString(1*inch, height - 1.5*inch, f"Date: {datetime.now().strftime('%d-%m-%Y')}")
+        c.drawString(col_x[0], self._header_y[1], self._gstin_text)
+        c.drawString(col_x[0], self._header_y[2], f"Date: {invoice_date}")
         
         # Customer details
         c.setFont("Helvetica-Bold", 12)
-        c.drawString(1*inch, height - 2*inch, "Bill To:")
+        c.drawString(col_x[0], self._customer_y[0], "Bill To:")
         c.setFont("Helvetica", 10)
-        c.drawString(1*inch, height - 2.3*inch, customer_data.get('name', 'Customer'))
-        c.drawString(1*inch, height - 2.5*inch, f"Phone: {customer_data.get('phone', 'N/A')}")
+        c.drawString(col_x[0], self._customer_y[1], customer_data.get('name', 'Customer'))
+        c.drawString(col_x[0], self._customer_y[2], f"Phone: {customer_data.get('phone', 'N/A')}")
         
         # Items table
-        y = height - 3.5*inch
+        y = self._table_y
         c.setFont("Helvetica-Bold", 10)
-        c.drawString(1*inch, y, "Item")
-        c.drawString(3*inch, y, "Qty")
-        c.drawString(4*inch, y, "Rate")
-        c.drawString(5*inch, y, "Amount")
+        c.drawString(col_x[0], y, "Item")
+        c.drawString(col_x[1], y, "Qty")
+        c.drawString(col_x[2], y, "Rate")
+        c.drawString(col_x[3], y, "Amount")
         
         y -= 0.3*inch
         c.setFont("Helvetica", 10)
         
-        total = 0
-        for item in order_data.get('items', []):
-            name = item.get('name', 'Item')
-            qty = item.get('quantity', 0)
-            rate = item.get('price', 50)  # Default price
-            amount = qty * rate
-            total += amount
-            
-            c.drawString(1*inch, y, f"{name} ({item.get('unit', 'unit')})")
-            c.drawString(3*inch, y, str(qty))
-            c.drawString(4*inch, y, f"₹{rate:.2f}")
-            c.drawString(5*inch, y, f"₹{amount:.2f}")
-            y -= 0.25*inch
+        # Line amounts and total
+        items = order_data.get('items', [])
+        qtys = np.fromiter((i.get('quantity', 0) for i in items), dtype=np.float64, count=len(items))
+        rates = np.fromiter((i.get('price', 50) for i in items), dtype=np.float64, count=len(items))  # Default price
+        amounts = qtys * rates
+        total = float(amounts.sum())
+        
+        rate_strs = [f"₹{r:.2f}" for r in rates]
+        amount_strs = [f"₹{a:.2f}" for a in amounts]
+        
+        for item, rate_str, amount_str in zip(items, rate_strs, amount_strs):
+            c.drawString(col_x[0], y, f"{item.get('name', 'Item')} ({item.get('unit', 'unit')})")
+            c.drawString(col_x[1], y, str(item.get('quantity', 0)))
+            c.drawString(col_x[2], y, rate_str)
+            c.drawString(col_x[3], y, amount_str)
+            y -= self._row_height
         
         # Total
         y -= 0.3*inch
-        c.line(1*inch, y, 6*inch, y)
+        c.line(self._rule_x[0], y, self._rule_x[1], y)
         y -= 0.3*inch
         c.setFont("Helvetica-Bold", 12)
-        c.drawString(4*inch, y, "Total:")
-        c.drawString(5*inch, y, f"₹{total:.2f}")
+        c.drawString(col_x[2], y, "Total:")
+        c.drawString(col_x[3], y, f"₹{total:.2f}")
         
         # UPI QR Code
         try:
-            upi_string = f"upi://pay?pa={self.upi_id}&pn={self.store_name}&am={total}&cu=INR"
-            qr = qrcode.QRCode(version=1, box_size=10, border=2)
-            qr.add_data(upi_string)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            img_buffer = BytesIO()
-            img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
+            upi_string = self._upi_prefix + f"{total:.2f}"
+            png = _qr_png(upi_string)
             
-            c.drawString(1*inch, 2*inch, "Scan to Pay:")
-            c.drawInlineImage(img_buffer, 1*inch, 0.5*inch, width=1.5*inch, height=1.5*inch)
+            x, qr_y, qr_w, qr_h = self._qr_box
+            c.drawString(x, self._qr_label_y, "Scan to Pay:")
+            c.drawImage(ImageReader(BytesIO(png)), x, qr_y, width=qr_w, height=qr_h)
         except Exception as e:
-            logger.error(f"Error generating QR code: {e}")
+            logger.error("Error generating QR code: %s", e)
         
         c.save()
-        logger.info(f"Invoice saved to {output_path}")
+        logger.info("Invoice saved to %s", output_path)
         return output_path
 
 
+# Generator owned by a PDF worker process, set up by init_invoice_worker
+_worker_gen = None
+
+
+def init_invoice_worker(store_name: str, store_gstin: str, upi_id: str):
+    """Build and warm up the invoice generator of a worker process (pool initializer)"""
+    global _worker_gen
+    _worker_gen = GSTInvoiceGenerator(store_name, store_gstin, upi_id)
+    _worker_gen.warmup()
+
+
+def create_invoice_in_worker(order_data: Dict, customer_data: Dict, output_path: str) -> str:
+    """
+    Create an invoice with the worker's own generator
+    
+    Kept at module level so only the order data is pickled per call.
+    """
+    return _worker_gen.create_invoice(order_data, customer_data, output_path)
+
+
 if __name__ == "__main__":
     # Test
     gen = GSTInvoiceGenerator()
@@ -4,24 +4,79 @@ Processes images of handwritten ledgers using Tesseract OCR.
 """
 
 import logging
-from typing import List, Dict
+import re
+import asyncio
+import concurrent.futures
+from typing import List, Dict, Tuple
 import os
 
-try:
-    import pytesseract
-    import cv2
-    import numpy as np
-except ImportError:
-    logging.warning("pytesseract or opencv not installed. OCR will not work.")
+import cv2
+import pytesseract
+from pytesseract import Output
 
 logger = logging.getLogger(__name__)
 
+# Ledger line format: "Item Name - Quantity Unit"; the unit must start with a
+# letter so a bare number is never split into quantity and unit
+_LINE_RE = re.compile(
+    r'^[ \t]*(?P<name>.+?)[ \t]*-[ \t]*(?P<qty>\d+(?:\.\d+)?)(?![\d.])[ \t]*(?P<unit>[^\W\d]\S*).*$'
+)
+
+
+def _read_ledger_lines(image_path: str, max_side: int) -> List[Tuple[str, float]]:
+    """
+    Preprocess an image and run Tesseract on it
+    
+    Kept at module level so it can be submitted to a worker process.
+    
+    Args:
+        image_path: Path to ledger image
+        max_side: Longest image side passed to Tesseract
+    
+    Returns:
+        List of (line text, mean word confidence) tuples
+    """
+    # Read image directly as grayscale
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    
+    # Downscale large photos before OCR
+    h, w = gray.shape
+    scale = max_side / max(h, w)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    # Apply threshold
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    
+    # Extract words using Tesseract (LSTM engine, single text block)
+    data = pytesseract.image_to_data(thresh, config='--oem 1 --psm 6', output_type=Output.DICT)
+    
+    # Group words back into lines
+    lines = {}
+    for i, word in enumerate(data['text']):
+        if not word.strip():
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append((word, float(data['conf'][i])))
+    
+    return [
+        (" ".join(w for w, _ in words), sum(c for _, c in words) / len(words))
+        for words in lines.values()
+    ]
+
 
 class LedgerOCR:
     """OCR processor for handwritten ledger images"""
     
+    # Longest image side passed to Tesseract; larger photos are downscaled
+    MAX_IMAGE_SIDE = 1500
+    
     def __init__(self):
         """Initialize OCR engine"""
+        # Worker processes for running Tesseract off the calling thread
+        self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
         logger.info("Ledger OCR initialized")
     
     def process_ledger(self, image_path: str) -> List[Dict]:
@@ -35,71 +90,77 @@ class LedgerOCR:
             List of extracted items with name, quantity, unit
         """
         if not os.path.exists(image_path):
-            logger.error(f"Image not found: {image_path}")
+            logger.error("Image not found: %s", image_path)
             return []
         
         try:
-            # Read image
-            img = cv2.imread(image_path)
-            
-            # Preprocess: convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Apply threshold
-            thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-            
-            # Extract text using Tesseract
-            text = pytesseract.image_to_string(thresh)
-            
-            logger.info(f"Extracted text: {text}")
-            
-            # Parse extracted text (simple parsing)
-            items = self._parse_ledger_text(text)
-            
-            return items
+            lines = _read_ledger_lines(image_path, self.MAX_IMAGE_SIDE)
+            return self._parse_ledger_lines(lines)
         
         except Exception as e:
-            logger.error(f"Error processing image: {e}")
+            logger.error("Error processing image: %s", e)
             return []
     
-    def _parse_ledger_text(self, text: str) -> List[Dict]:
+    async def process_ledger_async(self, image_path: str) -> List[Dict]:
         """
-        Parse OCR text into structured items
+        Process ledger image in a worker process without blocking the event loop
         
         Args:
-            text: Raw OCR text
+            image_path: Path to ledger image
         
         Returns:
-            List of item dicts
+            List of extracted items with name, quantity, unit
         """
-        items = []
-        lines = text.strip().split('\n')
+        if not os.path.exists(image_path):
+            logger.error("Image not found: %s", image_path)
+            return []
+        
+        try:
+            loop = asyncio.get_running_loop()
+            lines = await loop.run_in_executor(
+                self._pool, _read_ledger_lines, image_path, self.MAX_IMAGE_SIDE
+            )
+            return self._parse_ledger_lines(lines)
+        
+        except Exception as e:
+            logger.error("Error processing image: %s", e)
+            return []
+    
+    def close(self):
+        """Shut down the OCR worker processes"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _parse_ledger_lines(self, lines: List[Tuple[str, float]]) -> List[Dict]:
+        """
+        Parse OCR lines into structured items
+        
+        Args:
+            lines: (line text, confidence) tuples from Tesseract
+        
+        Returns:
+            List of item dicts with OCR confidence
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Extracted text: %s", "\n".join(line for line, _ in lines))
         
-        for line in lines:
-            if not line.strip():
-                continue
-            
-            # Simple pattern matching
-            # Expected format: "Item Name - Quantity Unit"
-            parts = line.split('-')
-            if len(parts) >= 2:
-                item_name = parts[0].strip()
-                quantity_unit = parts[1].strip().split()
-                
-                if len(quantity_unit) >= 2:
-                    try:
-                        quantity = float(quantity_unit[0])
-                        unit = quantity_unit[1]
-                        
-                        items.append({
-                            'name': item_name.lower(),
-                            'quantity': quantity,
-                            'unit': unit
-                        })
-                    except ValueError:
-                        logger.warning(f"Could not parse line: {line}")
+        items = []
+        for text, confidence in lines:
+            m = _LINE_RE.match(text)
+            if m:
+                item = self._item_from_match(m)
+                item['confidence'] = confidence
+                items.append(item)
         
         return items
+    
+    @staticmethod
+    def _item_from_match(m: re.Match) -> Dict:
+        """Build an item dict from a ledger line match"""
+        return {
+            'name': m['name'].lower(),
+            'quantity': float(m['qty']),
+            'unit': m['unit']
+        }
 
 
 if __name__ == "__main__":
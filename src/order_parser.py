@@ -5,48 +5,106 @@ structured order data with items, quantities, and units.
 """
 
 import re
+import sys
 import logging
-from typing import List, Dict, Optional
-from rapidfuzz import fuzz, process
+import functools
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Optional
+from rapidfuzz import process, fuzz
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class OrderItem:
+    """Single parsed order line"""
+    name: str
+    quantity: float
+    unit: str
+    original_text: str
+    
+    def to_dict(self) -> Dict:
+        """Dict form for callers that expect plain mappings"""
+        return {
+            'name': self.name,
+            'quantity': self.quantity,
+            'unit': self.unit,
+            'original_text': self.original_text
+        }
+
+
+# Clause separators: commas, "aur"/"and", or whitespace before the next quantity
+_SPLIT_RE = re.compile(r'\s*(?:,|\baur\b|\band\b)\s*|\s+(?=\d)', re.IGNORECASE)
+
+# Order item pattern: number + optional unit + product name
+_ITEM_RE = re.compile(
+    r'(\d+(?:\.\d+)?)\s*([a-zA-Z\u0900-\u097F]+)?\s+([a-zA-Z\u0900-\u097F]+(?:\s+[a-zA-Z\u0900-\u097F]+)*)',
+    re.IGNORECASE
+)
+
+
+# Common Hindi/Hinglish units and their standardized forms
+UNIT_MAPPINGS = {
+    # Weight
+    'kg': 'kg', 'kilo': 'kg', 'किलो': 'kg', 'keelo': 'kg',
+    'gm': 'gm', 'gram': 'gm', 'ग्राम': 'gm',
+    # Volume
+    'litre': 'litre', 'liter': 'litre', 'लीटर': 'litre', 'l': 'litre',
+    'ml': 'ml', 'millilitre': 'ml',
+    # Count
+    'piece': 'piece', 'pcs': 'piece', 'pc': 'piece', 'पीस': 'piece',
+    'packet': 'packet', 'pkt': 'packet', 'पैकेट': 'packet',
+    'bottle': 'bottle', 'बोतल': 'bottle',
+    'box': 'box', 'बॉक्स': 'box',
+    'dozen': 'dozen', 'दर्जन': 'dozen',
+}
+# Interned values so every parsed item shares the same unit strings
+UNIT_MAPPINGS = MappingProxyType({k.casefold(): sys.intern(v) for k, v in UNIT_MAPPINGS.items()})
+
+# Common product name variations
+PRODUCT_ALIASES = {
+    'atta': ['aata', 'आटा', 'flour'],
+    'milk': ['doodh', 'दूध'],
+    'rice': ['chawal', 'चावल'],
+    'sugar': ['cheeni', 'चीनी'],
+    'oil': ['tel', 'तेल'],
+    'dal': ['daal', 'दाल', 'lentils'],
+    'salt': ['namak', 'नमक'],
+    'tea': ['chai', 'चाय'],
+    'biscuit': ['biskut', 'बिस्कुट'],
+}
+PRODUCT_ALIASES = MappingProxyType({
+    sys.intern(k.casefold()): tuple(a.casefold() for a in v) for k, v in PRODUCT_ALIASES.items()
+})
+
+# Exact lookup of standard names and aliases
+_ALIAS_INDEX = {}
+for _standard_name, _aliases in PRODUCT_ALIASES.items():
+    _ALIAS_INDEX[_standard_name] = _standard_name
+    for _alias in _aliases:
+        _ALIAS_INDEX[_alias] = _standard_name
+_ALIAS_INDEX = MappingProxyType(_ALIAS_INDEX)
+
+# Flat candidate list for fuzzy matching
+_ALL_ALIASES = tuple(_ALIAS_INDEX)
+del _standard_name, _aliases, _alias
+
+
 class OrderParser:
     """Hinglish order text parser with fuzzy matching"""
     
-    # Common Hindi/Hinglish units and their standardized forms
-    UNIT_MAPPINGS = {
-        # Weight
-        'kg': 'kg', 'kilo': 'kg', 'किलो': 'kg', 'keelo': 'kg',
-        'gm': 'gm', 'gram': 'gm', 'ग्राम': 'gm',
-        # Volume
-        'litre': 'litre', 'liter': 'litre', 'लीटर': 'litre', 'l': 'litre',
-        'ml': 'ml', 'millilitre': 'ml',
-        # Count
-        'piece': 'piece', 'pcs': 'piece', 'pc': 'piece', 'पीस': 'piece',
-        'packet': 'packet', 'pkt': 'packet', 'पैकेट': 'packet',
-        'bottle': 'bottle', 'बोतल': 'bottle',
-        'box': 'box', 'बॉक्स': 'box',
-        'dozen': 'dozen', 'दर्जन': 'dozen',
-    }
+    UNIT_MAPPINGS = UNIT_MAPPINGS
+    PRODUCT_ALIASES = PRODUCT_ALIASES
+    known_products = tuple(PRODUCT_ALIASES)
     
-    # Common product name variations
-    PRODUCT_ALIASES = {
-        'atta': ['aata', 'आटा', 'flour'],
-        'milk': ['doodh', 'दूध'],
-        'rice': ['chawal', 'चावल'],
-        'sugar': ['cheeni', 'चीनी'],
-        'oil': ['tel', 'तेल'],
-        'dal': ['daal', 'दाल', 'lentils'],
-        'salt': ['namak', 'नमक'],
-        'tea': ['chai', 'चाय'],
-        'biscuit': ['biskut', 'बिस्कुट'],
-    }
+    # Default minimum similarity score for fuzzy product matching
+    MATCH_THRESHOLD = 70
     
     def __init__(self):
         """Initialize order parser"""
-        self.known_products = list(self.PRODUCT_ALIASES.keys())
+        # Lookup tables are shared module constants; only the match memo is per instance
+        self._match_cached = functools.lru_cache(maxsize=4096)(self._match_product)
         logger.info("Order parser initialized")
     
     def normalize_unit(self, unit_text: str) -> str:
@@ -54,15 +112,14 @@ class OrderParser:
         Normalize unit text to standard form
         
         Args:
-            unit_text: Raw unit string
+            unit_text: Casefolded unit token, as extracted by the order regex
         
         Returns:
             Standardized unit
         """
-        unit_lower = unit_text.lower().strip()
-        return self.UNIT_MAPPINGS.get(unit_lower, unit_lower)
+        return UNIT_MAPPINGS.get(unit_text, unit_text)
     
-    def fuzzy_match_product(self, product_text: str, threshold: int = 70) -> Optional[str]:
+    def fuzzy_match_product(self, product_text: str, threshold: int = MATCH_THRESHOLD) -> Optional[str]:
         """
         Fuzzy match product name to known products
         
@@ -73,27 +130,33 @@ class OrderParser:
         Returns:
             Matched product name or None
         """
-        product_lower = product_text.lower().strip()
+        return self._match_cached(product_text.casefold().strip(), threshold)
+    
+    def _match_product(self, product_lower: str, threshold: int) -> str:
+        """Match a normalized product name, see fuzzy_match_product"""
+        # Exact name or alias
+        hit = _ALIAS_INDEX.get(product_lower)
+        if hit:
+            return hit
         
-        # Check aliases
-        for standard_name, aliases in self.PRODUCT_ALIASES.items():
-            for alias in aliases:
-                if fuzz.ratio(product_lower, alias) >= threshold:
-                    return standard_name
+        # Empty, single-character or numeric leftovers can't reach the threshold
+        if len(product_lower) < 2 or product_lower.isdigit():
+            return product_lower
         
-        # Check known products directly
+        # Closest name or alias, scored in one batch so the query is
+        # preprocessed once for all candidates
         match = process.extractOne(
             product_lower,
-            self.known_products,
+            _ALL_ALIASES,
             scorer=fuzz.ratio,
             score_cutoff=threshold
         )
         
         if match:
-            return match[0]
+            return _ALIAS_INDEX[match[0]]
         
         # Return original if no match (allow new products)
-        return product_text.lower()
+        return product_lower
     
     def parse_hinglish_order(self, order_text: str) -> Dict:
         """
@@ -103,50 +166,50 @@ class OrderParser:
             order_text: Raw order message
         
         Returns:
-            Parsed order dict with items list
+            Parsed order dict with a list of OrderItem
         """
-        logger.info(f"Parsing order: {order_text}")
+        logger.info("Parsing order: %s", order_text)
+        
+        # Every item starts with a quantity, so prose-only messages can be skipped
+        if not any(c.isdigit() for c in order_text):
+            return {'items': [], 'original_text': order_text, 'total_items': 0}
         
         # Patterns to match:
         # - "2 kg atta"
         # - "1 litre milk"
         # - "500 gm sugar"
         # - "5 packet biscuit"
-        
-        # Regex pattern: number + optional unit + product name
-        pattern = r'(\d+(?:\.\d+)?)\s*([a-zA-Z\u0900-\u097F]+)?\s+([a-zA-Z\u0900-\u097F]+(?:\s+[a-zA-Z\u0900-\u097F]+)*)'
-        
-        matches = re.findall(pattern, order_text, re.IGNORECASE)
-        
+        # Casefold once so matched tokens need no further normalization,
+        # then scan each short clause separately (items may follow punctuation
+        # such as "*2 kg atta*" or "atta.1 litre milk")
         items = []
-        for match in matches:
-            quantity_str, unit_str, product_str = match
-            
-            try:
-                quantity = float(quantity_str)
-            except ValueError:
-                logger.warning(f"Invalid quantity: {quantity_str}")
+        for clause in _SPLIT_RE.split(order_text.casefold().strip()):
+            # Clauses without a quantity can't contain an item
+            if not any(c.isdigit() for c in clause):
                 continue
-            
-            # If no unit provided, assume common defaults
-            if not unit_str or unit_str.lower() in ['kg', 'litre', 'piece', 'packet']:
-                unit = self.normalize_unit(unit_str) if unit_str else 'piece'
-            else:
-                # Unit might be part of product name
-                product_str = f"{unit_str} {product_str}"
-                unit = 'piece'
-            
-            # Fuzzy match product
-            product = self.fuzzy_match_product(product_str)
-            
-            items.append({
-                'name': product,
-                'quantity': quantity,
-                'unit': unit,
-                'original_text': f"{quantity_str} {unit_str} {product_str}".strip()
-            })
-            
-            logger.info(f"Parsed item: {quantity} {unit} {product}")
+            for match in _ITEM_RE.finditer(clause):
+                quantity_str, unit_str, product_str = match.groups()
+                
+                try:
+                    quantity = float(quantity_str)
+                except ValueError:
+                    logger.warning("Invalid quantity: %s", quantity_str)
+                    continue
+                
+                # If no unit provided, assume common defaults
+                if not unit_str or unit_str in ['kg', 'litre', 'piece', 'packet']:
+                    unit = self.normalize_unit(unit_str) if unit_str else 'piece'
+                else:
+                    # Unit might be part of product name
+                    product_str = f"{unit_str} {product_str}"
+                    unit = 'piece'
+                
+                # Fuzzy match product
+                product = self._match_cached(product_str, self.MATCH_THRESHOLD)
+                
+                items.append(OrderItem(product, quantity, unit, match.group(0)))
+                
+                logger.debug("Parsed item: %s %s %s", quantity, unit, product)
         
         return {
             'items': items,
@@ -168,20 +231,17 @@ class OrderParser:
         if not parsed_order or not parsed_order.get('items'):
             return f"Sorry {customer_name}, I couldn't understand your order. Please try again."
         
-        items = parsed_order['items']
-        
         # Build order summary
-        summary_lines = [f"Thank you {customer_name}! Your order:"]
-        
-        for idx, item in enumerate(items, 1):
-            summary_lines.append(
-                f"{idx}. {item['quantity']} {item['unit']} {item['name'].title()}"
-            )
-        
-        summary_lines.append("\nYour order is confirmed! ✅")
-        summary_lines.append("We'll prepare it right away.")
+        body = "\n".join(
+            f"{idx}. {item.quantity} {item.unit} {item.name.title()}"
+            for idx, item in enumerate(parsed_order['items'], 1)
+        )
         
-        return "\n".join(summary_lines)
+        return (
+            f"Thank you {customer_name}! Your order:\n{body}\n"
+            "\nYour order is confirmed! ✅\n"
+            "We'll prepare it right away."
+        )
 
 
 # Example usage